@@ -0,0 +1,59 @@
+import sys
+import argparse
+from benchmarks.corpus import write_corpus
+from benchmarks.bench import suites, run_suite, save_results, load_results, compare_results, format_comparison
+
+
+def main(argv=None):
+	"""
+	command line entry point:
+	python -m benchmarks run -o results.json [--suite quick|full] [--repeat 10] [--rounds 5] [--case name]
+	python -m benchmarks compare baseline.json results.json [--threshold 0.1]
+	python -m benchmarks corpus out_dir [--suite quick|full]
+	"""
+	parser = argparse.ArgumentParser(prog='python -m benchmarks', description='benchmark VrtEditor on synthetic VRT\'s')
+	subparsers = parser.add_subparsers(dest='command', required=True)
+	run_parser = subparsers.add_parser('run', help='run a benchmark suite and save the results as json')
+	run_parser.add_argument('-o', '--out', default='benchmark_results.json', help='path to write results json')
+	run_parser.add_argument('--suite', choices=sorted(suites), default='quick')
+	run_parser.add_argument('--repeat', type=int, default=10, help='number of timed runs per benchmark')
+	run_parser.add_argument('--rounds', type=int, default=5, help='number of interleaved rounds over every case, the median is kept')
+	run_parser.add_argument('--case', action='append', help='only run this case of the suite, can be repeated')
+	compare_parser = subparsers.add_parser('compare', help='compare results to a baseline, exits 1 on regression or missing benchmark')
+	compare_parser.add_argument('baseline', help='path to baseline results json')
+	compare_parser.add_argument('current', help='path to current results json')
+	compare_parser.add_argument('--threshold', type=float, default=0.1, help='allowed increase as a fraction, 0.1 is 10%%')
+	corpus_parser = subparsers.add_parser('corpus', help='write the synthetic VRT\'s of a suite to a directory')
+	corpus_parser.add_argument('out_dir')
+	corpus_parser.add_argument('--suite', choices=sorted(suites), default='quick')
+	args = parser.parse_args(argv)
+
+	if args.command == 'run':
+		cases = suites[args.suite]
+		if args.case:
+			unknown = [name for name in args.case if name not in cases]
+			if len(unknown) > 0:
+				parser.error('unknown case(s) {} in suite {}'.format(', '.join(unknown), args.suite))
+			cases = {name: cases[name] for name in args.case}
+		save_results(run_suite(cases, repeat=args.repeat, rounds=args.rounds), args.out)
+		print('results written to {}'.format(args.out))
+	elif args.command == 'compare':
+		comparison = compare_results(load_results(args.baseline), load_results(args.current), threshold=args.threshold)
+		print(format_comparison(comparison))
+		missing = [row for row in comparison if row['metric'] == 'missing']
+		regressions = [row for row in comparison if row['regression'] and row['metric'] != 'missing']
+		if len(missing) > 0:
+			print('{} benchmark(s) missing from {}'.format(len(missing), args.current))
+		if len(regressions) > 0:
+			print('{} regression(s) above {:.0%}'.format(len(regressions), args.threshold))
+		if len(missing) > 0 or len(regressions) > 0:
+			return 1
+		print('no regressions above {:.0%}'.format(args.threshold))
+	elif args.command == 'corpus':
+		for out_path in write_corpus(args.out_dir, suites[args.suite]):
+			print(out_path)
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
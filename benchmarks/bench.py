@@ -0,0 +1,291 @@
+import gc
+import copy
+import json
+import time
+import platform
+import datetime
+import statistics
+import tracemalloc
+from vrt.edit import VrtEditor
+from vrt.storage import MemoryStorage
+from benchmarks.corpus import make_vrt_string, derived_func_str
+
+
+# quick cases - small enough to run on every change
+quick_cases = {
+	'bands_1_src_1': {'num_bands': 1, 'sources_per_band': 1},
+	'bands_4_src_1': {'num_bands': 4, 'sources_per_band': 1},
+	'bands_100_src_1': {'num_bands': 100, 'sources_per_band': 1},
+	'bands_1_src_1000': {'num_bands': 1, 'sources_per_band': 1000},
+	'bands_4_src_100_files_10': {'num_bands': 4, 'sources_per_band': 100, 'num_files': 10},
+	'bands_4_src_100_derived_2': {'num_bands': 4, 'sources_per_band': 100, 'derived_bands': 2},
+}
+
+# full cases - the extremes, these take a while
+full_cases = dict(quick_cases, **{
+	'bands_1000_src_1': {'num_bands': 1000, 'sources_per_band': 1},
+	'bands_1000_src_10_derived_500': {'num_bands': 1000, 'sources_per_band': 10, 'derived_bands': 500},
+	'bands_1_src_100000': {'num_bands': 1, 'sources_per_band': 100000},
+	'bands_3_src_10000_files_10000': {'num_bands': 3, 'sources_per_band': 10000, 'num_files': 10000},
+})
+
+# suites by name
+suites = {'quick': quick_cases, 'full': full_cases}
+
+
+def _band_num(vrt_editor, band):
+	"""
+	band number to use for a method - 0 for single band vrt
+	"""
+	return 0 if vrt_editor.num_bands == 1 else band
+
+
+def _op_embed_func_string(vrt_editor):
+	def op(vrt_editor):
+		vrt_editor.embed_func_string('add_10', derived_func_str, band_num=_band_num(vrt_editor, 1))
+	return op
+
+
+def _op_add_band_source(vrt_editor):
+	def op(vrt_editor):
+		band_src = vrt_editor.get_band_source(_band_num(vrt_editor, vrt_editor.num_bands))
+		vrt_editor.add_band_source(band_src, band_num=_band_num(vrt_editor, 1))
+	return op
+
+
+def _op_reorder_bands(vrt_editor):
+	# NOTE: reordering is not valid for single band vrt
+	if vrt_editor.num_bands == 1:
+		return None
+	band_order = list(range(vrt_editor.num_bands, 0, -1))
+	return lambda vrt_editor: vrt_editor.reorder_bands(band_order)
+
+
+def _op_remove_band(vrt_editor):
+	# NOTE: removing is not valid for single band vrt
+	if vrt_editor.num_bands == 1:
+		return None
+	return lambda vrt_editor: vrt_editor.remove_band(band_num=1)
+
+
+def _op_write_vrt(vrt_editor):
+	return lambda vrt_editor: vrt_editor.write_vrt('out.vrt')
+
+
+# editor methods timed on a fresh copy of the editor every repeat
+editor_ops = {
+	'embed_func_string': _op_embed_func_string,
+	'add_band_source': _op_add_band_source,
+	'reorder_bands': _op_reorder_bands,
+	'remove_band': _op_remove_band,
+	'write_vrt': _op_write_vrt,
+}
+
+
+# fixed data for the reference workload
+_reference_data = {'band': [{'@band': str(i), 'src': {'@xOff': str(i * 256), 'name': 'tile_{}.tif'.format(i)}} for i in range(200)]}
+
+
+def _reference_workload():
+	"""
+	fixed pure python workload with a similar profile to the editor (dict copies, string formatting)
+	timed next to every op so timings can be normalized for machine speed drift
+	"""
+	data = copy.deepcopy(_reference_data)
+	return json.dumps(data) + ''.join('{}{}'.format(key, val) for band in data['band'] for key, val in band.items())
+
+
+def _timed(method, *args):
+	"""
+	return seconds taken by method(*args)
+	"""
+	start = time.perf_counter()
+	method(*args)
+	return time.perf_counter() - start
+
+
+def time_op(setup, op, repeat=10):
+	"""
+	time op(setup()) repeat times after an untimed warm-up run, setup is not timed
+	garbage collection is disabled while timing so a collection does not land in one of the runs
+	peak memory is traced on a separate run so tracing does not skew the timings
+	each run is bracketed by runs of the reference workload and divided by their mean, so drift in machine speed
+	during the run cancels out - norm_median is the median of these normalized runs
+	returns dict of min/median seconds, norm_median and peak bytes allocated by op
+	"""
+	op(setup())
+	_reference_workload()
+	times = []
+	norm_times = []
+	gc_enabled = gc.isenabled()
+	try:
+		for _ in range(repeat):
+			arg = setup()
+			gc.collect()
+			gc.disable()
+			ref_before = _timed(_reference_workload)
+			times.append(_timed(op, arg))
+			ref_after = _timed(_reference_workload)
+			norm_times.append(times[-1] / ((ref_before + ref_after) / 2))
+			gc.enable()
+	finally:
+		if gc_enabled:
+			gc.enable()
+		else:
+			gc.disable()
+	arg = setup()
+	tracemalloc.start()
+	op(arg)
+	_, peak_mem = tracemalloc.get_traced_memory()
+	tracemalloc.stop()
+	return {
+		'min': min(times),
+		'median': statistics.median(times),
+		'norm_median': statistics.median(norm_times),
+		'peak_mem': peak_mem,
+	}
+
+
+def run_case(case_kwargs, repeat=10):
+	"""
+	time VrtEditor construction and each editor method for a single case
+	returns dict of op name to time_op results
+	"""
+	vrt_string = make_vrt_string(**case_kwargs)
+	results = {}
+	results['construct'] = time_op(lambda: vrt_string, lambda vrt_string: VrtEditor('bench.vrt', storage=MemoryStorage(), vrt_string=vrt_string), repeat)
+	vrt_editor = VrtEditor('bench.vrt', storage=MemoryStorage(), vrt_string=vrt_string)
+
+	def setup():
+		editor_copy = copy.copy(vrt_editor)
+		editor_copy.vrt_dict = copy.deepcopy(vrt_editor.vrt_dict)
+		editor_copy.storage = MemoryStorage()
+		return editor_copy
+
+	for op_name, make_op in editor_ops.items():
+		op = make_op(vrt_editor)
+		if op is not None:
+			results[op_name] = time_op(setup, op, repeat)
+	return results
+
+
+def _merge_rounds(round_results):
+	"""
+	merge the results of each round of an op
+	min is the fastest round, median/norm_median the median round
+	spread is how far the slowest round's norm_median is above the fastest (as a fraction) - it is only reported
+	"""
+	norm_medians = [round_result['norm_median'] for round_result in round_results]
+	return {
+		'min': min(round_result['min'] for round_result in round_results),
+		'median': statistics.median([round_result['median'] for round_result in round_results]),
+		'norm_median': statistics.median(norm_medians),
+		'spread': max(norm_medians) / min(norm_medians) - 1,
+		'peak_mem': min(round_result['peak_mem'] for round_result in round_results),
+	}
+
+
+def run_suite(cases, repeat=10, rounds=5, log=print):
+	"""
+	run every case rounds times and return results ready to be saved as json
+	rounds are interleaved (every case, then every case again) so each op is sampled at different times
+	results are keyed by '<case>/<op>'
+	"""
+	results = {}
+	for round_num in range(rounds):
+		for name, case_kwargs in cases.items():
+			if log is not None:
+				log('running {} (round {}/{})'.format(name, round_num + 1, rounds))
+			for op_name, op_result in run_case(case_kwargs, repeat).items():
+				key = '{}/{}'.format(name, op_name)
+				results.setdefault(key, []).append(op_result)
+	return {
+		'meta': {
+			'python': platform.python_version(),
+			'platform': platform.platform(),
+			'date': datetime.datetime.now().isoformat(timespec='seconds'),
+			'repeat': repeat,
+			'rounds': rounds,
+		},
+		'results': {key: _merge_rounds(round_results) for key, round_results in results.items()},
+	}
+
+
+def save_results(results, out_path):
+	"""
+	write results to a json file
+	"""
+	with open(out_path, 'w') as file_writer:
+		json.dump(results, file_writer, indent=2, sort_keys=True)
+
+
+def load_results(in_path):
+	"""
+	read results from a json file
+	"""
+	with open(in_path) as file_reader:
+		return json.load(file_reader)
+
+
+# absolute increase below which a metric is considered noise - seconds of median time for timings, bytes for memory
+# NOTE: ops taking tens of microseconds vary by ~30% between runs, a few microseconds, so their regressions are ignored
+noise_floor = {'time': 5e-5, 'peak_mem': 1024}
+
+
+def _ratio(base_val, cur_val):
+	"""
+	current over baseline, guarding against a zero baseline
+	"""
+	return cur_val / base_val if base_val > 0 else float('inf') if cur_val > 0 else 1.0
+
+
+def _is_regression(metric, base_result, cur_result, threshold):
+	"""
+	check if a metric regressed beyond threshold (as a fraction, 0.1 is 10%) - the ratio is compared to the threshold as-is
+	timings compare norm_median, so a slower or busier machine does not count, and must also be slower than the
+	noise floor in seconds of median time
+	"""
+	if _ratio(base_result[metric], cur_result[metric]) <= 1 + threshold:
+		return False
+	if metric == 'peak_mem':
+		return cur_result['peak_mem'] - base_result['peak_mem'] > noise_floor['peak_mem']
+	return cur_result['median'] - base_result['median'] > noise_floor['time']
+
+
+def compare_results(baseline, current, threshold=0.1, metrics=('norm_median', 'peak_mem')):
+	"""
+	compare current results to baseline results
+	returns list of dicts for every benchmark in the baseline, with the ratio of current to baseline and a regression flag
+	(see _is_regression), spread is the larger spread between rounds of the two timings - a large spread means the
+	machine was too noisy for the timing to be trusted
+	benchmarks in the baseline but missing from the current results (ex: the op now raises) are flagged as missing
+	"""
+	comparison = []
+	for key in sorted(baseline['results']):
+		base_result = baseline['results'][key]
+		if key not in current['results']:
+			comparison.append({'benchmark': key, 'metric': 'missing', 'baseline': float('nan'), 'current': float('nan'), 'ratio': float('nan'), 'spread': float('nan'), 'regression': True})
+			continue
+		cur_result = current['results'][key]
+		for metric in metrics:
+			comparison.append({
+				'benchmark': key,
+				'metric': metric,
+				'baseline': base_result[metric],
+				'current': cur_result[metric],
+				'ratio': _ratio(base_result[metric], cur_result[metric]),
+				'spread': float('nan') if metric == 'peak_mem' else max(base_result['spread'], cur_result['spread']),
+				'regression': _is_regression(metric, base_result, cur_result, threshold),
+			})
+	return comparison
+
+
+def format_comparison(comparison):
+	"""
+	format comparison as a table, regressions are marked with '!'
+	"""
+	lines = ['{:1} {:55} {:11} {:>14} {:>14} {:>8} {:>8}'.format('', 'benchmark', 'metric', 'baseline', 'current', 'ratio', 'spread')]
+	for row in comparison:
+		lines.append('{:1} {:55} {:11} {:>14.6g} {:>14.6g} {:>8.3f} {:>8.3f}'.format(
+			'!' if row['regression'] else '', row['benchmark'], row['metric'], row['baseline'], row['current'], row['ratio'], row['spread']))
+	return '\n'.join(lines)
@@ -0,0 +1,75 @@
+import os
+
+
+# pixel function embedded into the derived bands of the synthetic VRT's
+derived_func_str = '''
+import numpy as np
+
+def add_10(in_ar, out_ar, xoff, yoff, xsize, ysize, raster_xsize,raster_ysize, buf_radius, gt, **kwargs):
+	out_ar[:] = np.clip(np.add(in_ar[0], 10), 0, 255)
+'''
+
+# size of each source tile in pixels
+tile_size = 256
+
+
+def make_vrt_string(num_bands=1, sources_per_band=1, num_files=1, derived_bands=0, source_type='SimpleSource'):
+	"""
+	synthesize a VRT string - sources are tiled left to right, top to bottom in a square-ish grid
+	sources cycle through num_files files (tile_0.tif, tile_1.tif, ...), each file has num_bands bands
+	the last derived_bands bands get an embedded python pixel function
+	NOTE: the VRT is only valid XML for editing, the source files do not exist
+	"""
+	if derived_bands > num_bands:
+		raise ValueError('Number of derived bands {} higher than number of bands {}'.format(derived_bands, num_bands))
+	tiles_x = int(sources_per_band ** 0.5)
+	while sources_per_band % tiles_x != 0:
+		tiles_x -= 1
+	tiles_y = sources_per_band // tiles_x
+	x_size = tiles_x * tile_size
+	y_size = tiles_y * tile_size
+	lines = [
+		'<VRTDataset rasterXSize="{}" rasterYSize="{}">'.format(x_size, y_size),
+		'\t<SRS>EPSG:3857</SRS>',
+		'\t<GeoTransform> -1.3180784307377562e+07,  1.0000000000000000e+00,  0.0000000000000000e+00,  4.0108232606976344e+06,  0.0000000000000000e+00, -1.0000000000000000e+00</GeoTransform>',
+	]
+	for band in range(1, num_bands + 1):
+		if band > num_bands - derived_bands:
+			lines += [
+				'\t<VRTRasterBand dataType="Byte" band="{}" subClass="VRTDerivedRasterBand">'.format(band),
+				'\t\t<PixelFunctionType>add_10</PixelFunctionType>',
+				'\t\t<PixelFunctionLanguage>Python</PixelFunctionLanguage>',
+				'\t\t<PixelFunctionCode>{}</PixelFunctionCode>'.format(derived_func_str),
+			]
+		else:
+			lines.append('\t<VRTRasterBand dataType="Byte" band="{}">'.format(band))
+		for src in range(sources_per_band):
+			x_off = (src % tiles_x) * tile_size
+			y_off = (src // tiles_x) * tile_size
+			lines += [
+				'\t\t<{}>'.format(source_type),
+				'\t\t\t<SourceFilename relativeToVRT="1">tile_{}.tif</SourceFilename>'.format(src % num_files),
+				'\t\t\t<SourceBand>{}</SourceBand>'.format(band),
+				'\t\t\t<SourceProperties RasterXSize="{0}" RasterYSize="{0}" DataType="Byte" BlockXSize="{0}" BlockYSize="1" />'.format(tile_size),
+				'\t\t\t<SrcRect xOff="0" yOff="0" xSize="{0}" ySize="{0}" />'.format(tile_size),
+				'\t\t\t<DstRect xOff="{0}" yOff="{1}" xSize="{2}" ySize="{2}" />'.format(x_off, y_off, tile_size),
+				'\t\t</{}>'.format(source_type),
+			]
+		lines.append('\t</VRTRasterBand>')
+	lines.append('</VRTDataset>')
+	return '\n'.join(lines)
+
+
+def write_corpus(out_dir, cases):
+	"""
+	write a VRT for each case to out_dir, named after the case
+	cases is a dict of case name to make_vrt_string kwargs - returns the list of paths written
+	"""
+	os.makedirs(out_dir, exist_ok=True)
+	out_paths = []
+	for name, case_kwargs in cases.items():
+		out_path = os.path.join(out_dir, name + '.vrt')
+		with open(out_path, 'w') as file_writer:
+			file_writer.write(make_vrt_string(**case_kwargs))
+		out_paths.append(out_path)
+	return out_paths
@@ -13,14 +13,17 @@ setup(
       author_email='anash@protonmail.com',
       license='MIT',
       dependency_links=[],
-      packages=find_packages(exclude=["contrib", "docs", "tests"]),
+      packages=find_packages(exclude=["contrib", "docs", "tests", "benchmarks"]),
       include_package_data=True,
-      python_requires=">=3.6, <4",
+      python_requires=">=3.7, <4",
       install_requires=[
             "numba>=0.50.1",
             "numpy>=1.19.0",
             "pytest==5.4.3",
             "xmltodict>=0.12.0",
       ],
+      extras_require={
+            "s3": ["boto3>=1.14.0"],
+      },
       zip_safe=False
 )
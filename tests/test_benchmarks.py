@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import pytest
+from vrt.edit import VrtEditor
+from benchmarks.corpus import make_vrt_string, write_corpus
+from benchmarks.bench import run_case, run_suite, compare_results
+from benchmarks.__main__ import main
+
+
+# tiny cases so the benchmark code itself is tested quickly
+tiny_cases = {
+	'bands_1_src_1': {'num_bands': 1, 'sources_per_band': 1},
+	'bands_3_src_6_files_2_derived_1': {'num_bands': 3, 'sources_per_band': 6, 'num_files': 2, 'derived_bands': 1},
+}
+
+
+### Corpus
+
+def test_make_vrt_string():
+	vrt1 = VrtEditor('bench.vrt', vrt_string=make_vrt_string(**tiny_cases['bands_3_src_6_files_2_derived_1']))
+	assert vrt1.num_bands == 3
+	# 6 sources tiled 2 x 3
+	assert vrt1.vrt_dict['VRTDataset']['@rasterXSize'] == '512'
+	assert vrt1.vrt_dict['VRTDataset']['@rasterYSize'] == '768'
+	band_src = vrt1.get_band_source(1)['band_src']
+	assert len(band_src) == 6
+	assert set(src['SourceFilename']['#text'] for src in band_src) == {'tile_0.tif', 'tile_1.tif'}
+	# only the last band is derived
+	bands = vrt1.vrt_dict['VRTDataset']['VRTRasterBand']
+	assert [band.get('@subClass') for band in bands] == [None, None, 'VRTDerivedRasterBand']
+	with pytest.raises(ValueError):
+		make_vrt_string(num_bands=1, derived_bands=2)
+
+
+def test_write_corpus(tmp_path):
+	out_paths = write_corpus(str(tmp_path), tiny_cases)
+	assert [os.path.basename(out_path) for out_path in out_paths] == ['bands_1_src_1.vrt', 'bands_3_src_6_files_2_derived_1.vrt']
+	assert VrtEditor(out_paths[0]).num_bands == 1
+
+
+### Benchmarks
+
+def test_run_case():
+	# single band vrt skips reorder_bands and remove_band
+	assert sorted(run_case(tiny_cases['bands_1_src_1'], repeat=1).keys()) == ['add_band_source', 'construct', 'embed_func_string', 'write_vrt']
+	results = run_case(tiny_cases['bands_3_src_6_files_2_derived_1'], repeat=2)
+	assert len(results) == 6
+	for op_result in results.values():
+		assert op_result['min'] <= op_result['median']
+		assert op_result['peak_mem'] >= 0
+
+
+def test_compare_results():
+	def result(norm_median, median, peak_mem, spread=0.0):
+		return {'min': median, 'median': median, 'norm_median': norm_median, 'spread': spread, 'peak_mem': peak_mem}
+
+	baseline = {'results': {
+		'case/fast': result(10.0, 1.0, 10000),
+		'case/slow': result(10.0, 1.0, 10000),
+		'case/machine': result(10.0, 1.0, 10000),
+		'case/threshold': result(10.0, 1.0, 10000),
+		'case/noise': result(0.01, 1e-6, 10),
+		'case/removed': result(10.0, 1.0, 10000),
+	}}
+	current = {'results': {
+		'case/fast': result(5.0, 0.5, 10000),
+		'case/slow': result(15.0, 1.5, 20000),
+		# slower in seconds but not relative to the reference workload - the machine is slower
+		'case/machine': result(10.0, 1.5, 10000),
+		# just over the threshold, the spread between rounds is reported but does not widen the threshold
+		'case/threshold': result(11.5, 1.15, 10000, spread=0.3),
+		'case/noise': result(0.05, 5e-6, 100),
+		'case/added': result(10.0, 1.0, 10000),
+	}}
+	comparison = compare_results(baseline, current, threshold=0.1)
+	regressions = [(row['benchmark'], row['metric']) for row in comparison if row['regression']]
+	# noise floor ignores tiny absolute increases, benchmarks missing from the current results fail
+	assert regressions == [('case/removed', 'missing'), ('case/slow', 'norm_median'), ('case/slow', 'peak_mem'), ('case/threshold', 'norm_median')]
+	assert len(comparison) == 11
+	# the ratio shown is the one compared to the threshold
+	threshold_row = [row for row in comparison if row['benchmark'] == 'case/threshold' and row['metric'] == 'norm_median'][0]
+	assert threshold_row['ratio'] == pytest.approx(1.15)
+	assert threshold_row['spread'] == 0.3
+	assert not [row for row in compare_results(baseline, current, threshold=0.2) if row['benchmark'] == 'case/threshold'][0]['regression']
+	# a missing benchmark fails regardless of threshold
+	assert [(row['benchmark'], row['metric']) for row in compare_results(baseline, current, threshold=1.0) if row['regression']] == [('case/removed', 'missing')]
+
+
+def test_compare_same_code():
+	# two runs of the same code compare clean
+	baseline = run_suite(tiny_cases, repeat=3, log=None)
+	current = run_suite(tiny_cases, repeat=3, log=None)
+	comparison = compare_results(baseline, current)
+	assert [row for row in comparison if row['regression']] == []
+	assert len(comparison) == 2 * len(baseline['results'])
+
+
+def test_compare_slowdown(monkeypatch):
+	# a real ~30% slowdown of to_string is caught at the default threshold
+	cases = {'bands_4_src_100': {'num_bands': 4, 'sources_per_band': 100}}
+	baseline = run_suite(cases, repeat=3, rounds=3, log=None)
+	to_string = VrtEditor.to_string
+
+	def slow_to_string(vrt_editor):
+		start = time.perf_counter()
+		vrt_string = to_string(vrt_editor)
+		# busy wait for another 30% of the time taken
+		end = time.perf_counter() + (time.perf_counter() - start) * 0.3
+		while time.perf_counter() < end:
+			pass
+		return vrt_string
+
+	monkeypatch.setattr(VrtEditor, 'to_string', slow_to_string)
+	current = run_suite(cases, repeat=3, rounds=3, log=None)
+	rows = {row['benchmark']: row for row in compare_results(baseline, current, threshold=0.1) if row['metric'] == 'norm_median'}
+	assert rows['bands_4_src_100/write_vrt']['regression']
+	assert rows['bands_4_src_100/write_vrt']['ratio'] > 1.1
+
+
+def test_cli(tmp_path):
+	baseline_path = str(tmp_path / 'baseline.json')
+	current_path = str(tmp_path / 'current.json')
+	assert main(['run', '-o', baseline_path, '--repeat', '1', '--rounds', '1', '--case', 'bands_1_src_1']) == 0
+	with open(baseline_path) as file_reader:
+		baseline = json.load(file_reader)
+	assert 'bands_1_src_1/construct' in baseline['results']
+	# a results file with everything 10x slower is flagged
+	for op_result in baseline['results'].values():
+		for metric in ['min', 'median', 'norm_median']:
+			op_result[metric] = op_result[metric] * 10 + 1
+	with open(current_path, 'w') as file_writer:
+		json.dump(baseline, file_writer)
+	assert main(['compare', baseline_path, current_path]) == 1
+	assert main(['compare', current_path, baseline_path]) == 0
+	assert main(['compare', baseline_path, baseline_path]) == 0
+	# a benchmark missing from the current results fails
+	del baseline['results']['bands_1_src_1/construct']
+	with open(current_path, 'w') as file_writer:
+		json.dump(baseline, file_writer)
+	assert main(['compare', baseline_path, current_path]) == 1
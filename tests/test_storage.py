@@ -0,0 +1,264 @@
+import os
+import pytest
+from vrt.edit import VrtEditor
+from vrt.storage import StorageBackend, LocalStorage, MemoryStorage, S3Storage
+from vrt.batch import BatchError, load_vrts, write_vrts, edit_vrts
+
+
+# directory of test files
+test_dir = 'tests/samples'
+
+# path to vrt file on disk - 1 band
+vrt_path_1band = os.path.join(test_dir, 'naip_hermosa_clip_1band.vrt')
+
+# path to vrt file on disk - 3 band
+vrt_path_3band = os.path.join(test_dir, 'naip_hermosa_clip_3band.vrt')
+
+# string of python pixel function to be embedded
+add_10_str = '''
+import numpy as np
+
+def add_10(in_ar, out_ar, xoff, yoff, xsize, ysize, raster_xsize,raster_ysize, buf_radius, gt, **kwargs):
+	out_ar[:] = np.clip(np.add(in_ar[0], 10), 0, 255)
+'''
+
+
+def memory_storage(num_files):
+	"""
+	memory storage with num_files copies of the 1 band vrt
+	"""
+	vrt_string = LocalStorage().read(vrt_path_1band)
+	return MemoryStorage({'in/{}.vrt'.format(i): vrt_string for i in range(num_files)})
+
+
+def embed_add_10(vrt_editor):
+	vrt_editor.embed_func_string('add_10', add_10_str)
+
+
+class FlakyStorage(MemoryStorage):
+	"""
+	memory storage that fails the first read of every path
+	"""
+	def __init__(self, files=None):
+		super().__init__(files)
+		self.failed = set()
+
+	def read(self, path):
+		if path not in self.failed:
+			self.failed.add(path)
+			raise ConnectionError('flaky read')
+		return super().read(path)
+
+
+### Storage Backends
+
+def test_memory_storage():
+	storage = memory_storage(1)
+	vrt1 = VrtEditor('in/0.vrt', storage=storage)
+	vrt1.embed_func_string('add_10', add_10_str)
+	# written to the storage the vrt was read with
+	vrt1.write_vrt('out/0.vrt')
+	assert 'add_10' in storage.files['out/0.vrt']
+	with pytest.raises(FileNotFoundError):
+		VrtEditor('in/missing.vrt', storage=storage)
+
+
+def test_storage_backend_abstract():
+	# backends must implement both read and write
+	with pytest.raises(TypeError):
+		StorageBackend()
+
+	class ReadOnlyStorage(StorageBackend):
+		def read(self, path):
+			return ''
+
+	with pytest.raises(TypeError):
+		ReadOnlyStorage()
+
+
+def test_vrt_string():
+	vrt_string = LocalStorage().read(vrt_path_3band)
+	vrt2 = VrtEditor(vrt_path_3band, vrt_string=vrt_string)
+	assert vrt2.num_bands == 3
+	assert vrt2.to_string() == VrtEditor(vrt_path_3band).to_string()
+
+
+def test_rewrite_source_filenames():
+	vrt3 = VrtEditor(vrt_path_3band)
+	vrt3.rewrite_source_filenames()
+	src_filename = vrt3.get_band_source(1)['band_src'][0]['SourceFilename']
+	assert src_filename['@relativeToVRT'] == '0'
+	assert src_filename['#text'] == os.path.abspath(os.path.join(test_dir, 'naip_hermosa_clip_3band.tif'))
+	# s3 paths are rewritten to /vsis3/ paths
+	vrt4 = VrtEditor('s3://bucket/swaths/clip.vrt', storage=S3Storage(client=object()), vrt_string=vrt3.to_string().replace(os.path.abspath(test_dir), 's3://bucket/tifs'))
+	vrt4.rewrite_source_filenames()
+	assert vrt4.get_band_source(2)['band_src'][0]['SourceFilename']['#text'] == '/vsis3/bucket/tifs/naip_hermosa_clip_3band.tif'
+	vrt5 = VrtEditor('s3://bucket/swaths/clip.vrt', storage=S3Storage(client=object()), vrt_string=LocalStorage().read(vrt_path_1band))
+	vrt5.rewrite_source_filenames()
+	assert vrt5.get_band_source()['band_src'][0]['SourceFilename']['#text'] == '/vsis3/bucket/swaths/naip_hermosa_clip_1band.tif'
+
+
+def test_rewrite_source_filenames_normalized():
+	vrt_string = LocalStorage().read(vrt_path_1band).replace('>naip_hermosa_clip_1band.tif<', '>../tifs/naip_hermosa_clip_1band.tif<')
+	vrt6 = VrtEditor('s3://bucket/swaths/clip.vrt', storage=S3Storage(client=object()), vrt_string=vrt_string)
+	vrt6.rewrite_source_filenames()
+	assert vrt6.get_band_source()['band_src'][0]['SourceFilename']['#text'] == '/vsis3/bucket/tifs/naip_hermosa_clip_1band.tif'
+	vrt7 = VrtEditor(vrt_path_1band, vrt_string=vrt_string)
+	vrt7.rewrite_source_filenames()
+	assert vrt7.get_band_source()['band_src'][0]['SourceFilename']['#text'] == os.path.abspath('tests/tifs/naip_hermosa_clip_1band.tif')
+
+
+def test_rewrite_source_filenames_overviews(tmp_path):
+	out_name = str(tmp_path / 'out' / 'o.vrt')
+	os.makedirs(os.path.dirname(out_name))
+	vrt8 = VrtEditor(vrt_path_1band)
+	ovr_paths = vrt8.build_overviews(out_name, [2])
+	vrt8.rewrite_source_filenames()
+	band = vrt8.vrt_dict['VRTDataset']['VRTRasterBand']
+	tif_path = os.path.abspath(os.path.join(test_dir, 'naip_hermosa_clip_1band.tif'))
+	# overviews resolve against where they were written, sources against the input vrt
+	assert band['Overview']['SourceFilename']['#text'] == ovr_paths[0]
+	assert band['SimpleSource']['SourceFilename']['#text'] == tif_path
+	# the overview vrt was written somewhere else, so its sources were rewritten too
+	ovr_src = VrtEditor(ovr_paths[0]).get_band_source()['band_src'][0]['SourceFilename']
+	assert ovr_src == {'@relativeToVRT': '0', '#text': tif_path}
+
+
+def test_batch_edit_overviews_rewrite_sources():
+	storage = memory_storage(5)
+	in_paths = ['in/{}.vrt'.format(i) for i in range(5)]
+	out_paths = ['out/{}.vrt'.format(i) for i in range(5)]
+
+	def overviews(vrt_editor):
+		return vrt_editor.prepare_overviews(vrt_editor.in_path.replace('in/', 'out/'), [2])
+
+	edit_vrts(in_paths, out_paths, overviews, storage=storage, rewrite_sources=True)
+	for i in range(5):
+		out_editor = VrtEditor('out/{}.vrt'.format(i), storage=storage)
+		assert out_editor.vrt_dict['VRTDataset']['VRTRasterBand']['Overview']['SourceFilename']['#text'] == 'out/{}_ovr2.vrt'.format(i)
+		ovr_editor = VrtEditor('out/{}_ovr2.vrt'.format(i), storage=storage)
+		assert ovr_editor.get_band_source()['band_src'][0]['SourceFilename']['#text'] == 'in/naip_hermosa_clip_1band.tif'
+
+
+### Batch
+
+def test_batch_load_write():
+	storage = memory_storage(100)
+	in_paths = ['in/{}.vrt'.format(i) for i in range(100)]
+	vrt_editors = load_vrts(in_paths, storage=storage, max_in_flight=8)
+	assert [vrt_editor.in_path for vrt_editor in vrt_editors] == in_paths
+	out_paths = ['out/{}.vrt'.format(i) for i in range(100)]
+	write_vrts(vrt_editors, out_paths, max_in_flight=8)
+	assert all(out_path in storage.files for out_path in out_paths)
+	with pytest.raises(ValueError):
+		write_vrts(vrt_editors, out_paths[1:])
+
+
+def test_batch_edit():
+	storage = memory_storage(50)
+	out_storage = MemoryStorage()
+	in_paths = ['in/{}.vrt'.format(i) for i in range(50)]
+	out_paths = ['out/{}.vrt'.format(i) for i in range(50)]
+	edit_vrts(in_paths, out_paths, embed_add_10, storage=storage, out_storage=out_storage, max_in_flight=4)
+	assert sorted(out_storage.files.keys()) == sorted(out_paths)
+	assert all('add_10' in vrt_string for vrt_string in out_storage.files.values())
+
+
+def test_batch_edit_overviews():
+	storage = memory_storage(10)
+	in_paths = ['in/{}.vrt'.format(i) for i in range(10)]
+	out_paths = ['in/out_{}.vrt'.format(i) for i in range(10)]
+
+	def embed_with_overviews(vrt_editor):
+		vrt_editor.embed_func_string('add_10', add_10_str)
+		# return the overview strings so they are written asynchronously with the edited vrt
+		return vrt_editor.prepare_overviews(vrt_editor.in_path.replace('in/', 'in/out_'), [2, 4])
+
+	edit_vrts(in_paths, out_paths, embed_with_overviews, storage=storage, max_in_flight=4)
+	for i in range(10):
+		assert 'in/out_{}_ovr2.vrt'.format(i) in storage.files
+		assert 'in/out_{}_ovr4.vrt'.format(i) in storage.files
+		assert 'out_{}_ovr4.vrt'.format(i) in storage.files['in/out_{}.vrt'.format(i)]
+
+
+def test_build_overviews_storage():
+	storage = memory_storage(1)
+	vrt6 = VrtEditor('in/0.vrt', storage=storage)
+	# overview vrts are written with the storage the vrt was read with
+	assert vrt6.build_overviews('in/out.vrt', [2]) == ['in/out_ovr2.vrt']
+	assert '<VRTDataset rasterXSize="769" rasterYSize="926">' in storage.files['in/out_ovr2.vrt']
+
+
+def test_batch_retries():
+	storage = FlakyStorage(memory_storage(10).files)
+	in_paths = ['in/{}.vrt'.format(i) for i in range(10)]
+	vrt_editors = load_vrts(in_paths, storage=storage, retries=1, backoff=0)
+	assert len(vrt_editors) == 10
+	# missing files are not retried
+	with pytest.raises(BatchError) as batch_error:
+		load_vrts(['in/missing.vrt'], storage=storage, retries=3, backoff=0)
+	assert isinstance(batch_error.value.failures['in/missing.vrt'], FileNotFoundError)
+	# out of retries
+	with pytest.raises(BatchError) as batch_error:
+		load_vrts(['in/flaky.vrt'], storage=FlakyStorage(), retries=0, backoff=0)
+	assert isinstance(batch_error.value.failures['in/flaky.vrt'], ConnectionError)
+
+
+def test_batch_failures_collected():
+	storage = memory_storage(10)
+	in_paths = ['in/{}.vrt'.format(i) for i in range(10)]
+	in_paths[3] = 'in/missing.vrt'
+	out_paths = ['out/{}.vrt'.format(i) for i in range(10)]
+	# one missing file does not stop the rest of the batch
+	with pytest.raises(BatchError) as batch_error:
+		edit_vrts(in_paths, out_paths, embed_add_10, storage=storage, max_in_flight=2, retries=0)
+	assert list(batch_error.value.failures.keys()) == ['in/missing.vrt']
+	assert 'in/missing.vrt' in str(batch_error.value)
+	assert batch_error.value.results == out_paths[:3] + [None] + out_paths[4:]
+	assert all(out_path in storage.files for out_path in out_paths if out_path != 'out/3.vrt')
+	assert 'out/3.vrt' not in storage.files
+
+
+### S3
+
+def test_s3_batch_edit(monkeypatch):
+	moto = pytest.importorskip('moto')
+	boto3 = pytest.importorskip('boto3')
+	monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+	monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+	with moto.mock_aws():
+		client = boto3.client('s3', region_name='us-east-1')
+		client.create_bucket(Bucket='swaths')
+		vrt_string = LocalStorage().read(vrt_path_1band)
+		for i in range(20):
+			client.put_object(Bucket='swaths', Key='in/{}.vrt'.format(i), Body=vrt_string.encode('utf-8'))
+		with S3Storage(bucket='swaths', region_name='us-east-1', max_pool_connections=8) as storage:
+			in_paths = ['s3://swaths/in/{}.vrt'.format(i) for i in range(20)]
+			out_paths = ['out/{}.vrt'.format(i) for i in range(20)]
+			edit_vrts(in_paths, out_paths, embed_add_10, storage=storage, max_in_flight=8, rewrite_sources=True)
+			out_string = storage.read('/vsis3/swaths/out/0.vrt')
+			assert 'add_10' in out_string
+			assert '/vsis3/swaths/in/naip_hermosa_clip_1band.tif' in out_string
+			with pytest.raises(FileNotFoundError):
+				storage.read('s3://swaths/in/missing.vrt')
+			with pytest.raises(FileNotFoundError):
+				storage.read('s3://missing/in/0.vrt')
+
+
+def test_s3_errors_not_retried(monkeypatch):
+	boto3 = pytest.importorskip('boto3')
+	stub = pytest.importorskip('botocore.stub')
+	monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+	monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+	client = boto3.client('s3', region_name='us-east-1')
+	storage = S3Storage(bucket='swaths', client=client)
+	# NOTE: only one response is stubbed, so a retry would fail with a different error
+	with stub.Stubber(client) as stubber:
+		stubber.add_client_error('get_object', service_error_code='AccessDenied', http_status_code=403)
+		with pytest.raises(BatchError) as batch_error:
+			load_vrts(['in/0.vrt'], storage=storage, retries=3, backoff=0)
+		assert isinstance(batch_error.value.failures['in/0.vrt'], PermissionError)
+		stubber.add_client_error('put_object', service_error_code='NoSuchBucket', http_status_code=404)
+		with pytest.raises(FileNotFoundError):
+			storage.write('in/0.vrt', 'vrt')
+		stubber.assert_no_pending_responses()
@@ -332,3 +332,92 @@ def test_numba():
 	if not keep_files:
 		os.remove(out_name)
 
+
+
+### Overviews
+
+def test_overview_list():
+	out_name = os.path.join(test_dir, 'overview_list.vrt')
+	vrt15 = VrtEditor(vrt_path_3band)
+	# let gdal build implicit overviews from the source overviews
+	vrt15.add_overview_list([2, 4, 8], resampling='average')
+	# write the vrt to disk
+	vrt15.write_vrt(out_name)
+	# ensure the new file was written
+	assert os.path.exists(out_name)
+	assert vrt15.vrt_dict['VRTDataset']['OverviewList']['#text'] == '2 4 8'
+	# ensure it fails properly
+	with pytest.raises(ValueError):
+		vrt15.add_overview_list([1, 2])
+	with pytest.raises(ValueError):
+		vrt15.add_overview_list([2], resampling='bad')
+	# remove file created if desired
+	if not keep_files:
+		os.remove(out_name)
+
+
+def test_build_overviews():
+	out_name = os.path.join(test_dir, 'hillshade_ovr.vrt')
+	vrt16 = VrtEditor(vrt_path_1band)
+	# NOTE: window is a made up argument measured in pixels, so it needs to shrink with each level
+	vrt16.embed_func_module('hillshade', 'hillshading', buffer_radius=1, **{'scale': '111120', 'z_factor': '30', 'window': '8'})
+	# write a vrt per overview level, scaling the window with the level
+	ovr_paths = vrt16.build_overviews(out_name, [4, 2], scale_kwargs={'window': lambda val, factor: max(1, int(val) // factor)})
+	# write the vrt to disk
+	vrt16.write_vrt(out_name)
+	# ensure the new files were written, smallest factor first
+	assert ovr_paths == [os.path.join(test_dir, 'hillshade_ovr_ovr2.vrt'), os.path.join(test_dir, 'hillshade_ovr_ovr4.vrt')]
+	assert os.path.exists(out_name)
+	for ovr_path in ovr_paths:
+		assert os.path.exists(ovr_path)
+	# ensure the overviews are referenced by the band
+	overviews = vrt16.vrt_dict['VRTDataset']['VRTRasterBand']['Overview']
+	assert [ovr['SourceFilename']['#text'] for ovr in overviews] == ['hillshade_ovr_ovr2.vrt', 'hillshade_ovr_ovr4.vrt']
+	# ensure the overview level was reduced - decimated SrcRect, reduced DstRect
+	ovr4 = VrtEditor(ovr_paths[1])
+	band = ovr4.vrt_dict['VRTDataset']['VRTRasterBand']
+	assert ovr4.vrt_dict['VRTDataset']['@rasterXSize'] == '385'
+	assert ovr4.vrt_dict['VRTDataset']['@rasterYSize'] == '463'
+	assert band['SimpleSource']['SrcRect']['@xSize'] == '1538'
+	assert band['SimpleSource']['DstRect']['@xSize'] == '385'
+	assert band['PixelFunctionArguments']['@window'] == '2'
+	# pixel size comes from the scaled GeoTransform, so z_factor is left alone
+	assert band['PixelFunctionArguments']['@z_factor'] == '30'
+	base_res = float(vrt16.vrt_dict['VRTDataset']['GeoTransform'].split(',')[1])
+	assert float(ovr4.vrt_dict['VRTDataset']['GeoTransform'].split(',')[1]) == pytest.approx(base_res * 1538 / 385)
+	assert 'Overview' not in band.keys()
+	# remove files created if desired
+	if not keep_files:
+		os.remove(out_name)
+		for ovr_path in ovr_paths:
+			os.remove(ovr_path)
+
+
+def test_build_overviews_source_overviews():
+	out_name = os.path.join(test_dir, 'source_ovr.vrt')
+	vrt17 = VrtEditor(vrt_path_4band)
+	# point each level at the matching source overview
+	ovr_paths = vrt17.build_overviews(out_name, [2], use_source_overviews=True)
+	# write the vrt to disk
+	vrt17.write_vrt(out_name)
+	assert os.path.exists(ovr_paths[0])
+	# ensure every band references the overview
+	for band in vrt17.vrt_dict['VRTDataset']['VRTRasterBand']:
+		assert band['Overview']['SourceBand'] == band['@band']
+	# ensure the sources read from the source overview
+	ovr2 = VrtEditor(ovr_paths[0])
+	src = ovr2.vrt_dict['VRTDataset']['VRTRasterBand'][0]['SimpleSource']
+	assert src['OpenOptions']['OOI']['@key'] == 'OVERVIEW_LEVEL'
+	assert src['OpenOptions']['OOI']['#text'] == '0'
+	assert src['SrcRect']['@xSize'] == '769'
+	assert src['SrcRect']['@ySize'] == '926'
+	# the full resolution block sizes do not apply to the source overview, gdal reads them from the file
+	assert 'SourceProperties' not in src.keys()
+	# ensure it fails properly - no power of 2 source overview level
+	with pytest.raises(ValueError):
+		vrt17.build_overviews(out_name, [3], use_source_overviews=True)
+	# remove files created if desired
+	if not keep_files:
+		os.remove(out_name)
+		for ovr_path in ovr_paths:
+			os.remove(ovr_path)
@@ -0,0 +1,138 @@
+import asyncio
+from vrt.edit import VrtEditor
+from vrt.storage import LocalStorage
+
+
+# errors that will not go away by trying again
+# NOTE: storage backends map their permanent errors to these (ex: S3Storage maps 403 to PermissionError)
+no_retry_errors = (FileNotFoundError, PermissionError, ValueError)
+
+
+class BatchError(Exception):
+	"""
+	raised once every path in a batch has been tried, if any of them failed
+	failures maps each failed path to its exception, results holds the result of every path (None where it failed)
+	"""
+	def __init__(self, failures, results):
+		self.failures = failures
+		self.results = results
+		super().__init__('{} of {} paths failed: {}'.format(len(failures), len(results), ', '.join(failures.keys())))
+
+
+async def _with_retries(method, *args, retries=3, backoff=0.5):
+	"""
+	await a storage method, retrying with exponential backoff on failure
+	NOTE: retries is the number of retries after the first attempt - this is the only retry layer, storage backends do not retry
+	"""
+	for attempt in range(retries + 1):
+		try:
+			return await method(*args)
+		except no_retry_errors:
+			raise
+		except Exception:
+			if attempt == retries:
+				raise
+			await asyncio.sleep(backoff * 2 ** attempt)
+
+
+async def _gather_batch(paths, coroutines):
+	"""
+	await every coroutine, then raise a BatchError if any failed so one bad path does not abandon the rest
+	"""
+	results = await asyncio.gather(*coroutines, return_exceptions=True)
+	failures = {path: result for path, result in zip(paths, results) if isinstance(result, BaseException)}
+	if failures:
+		raise BatchError(failures, [None if isinstance(result, BaseException) else result for result in results])
+	return results
+
+
+async def load_vrts_async(in_paths, storage=None, max_in_flight=32, retries=3, backoff=0.5):
+	"""
+	concurrently read VRT's and return a list of VrtEditor's in the same order as in_paths
+	max_in_flight bounds the number of requests at any one time
+	NOTE: every path is tried, failures are raised together afterwards as a BatchError
+	"""
+	if storage is None:
+		storage = LocalStorage()
+	semaphore = asyncio.Semaphore(max_in_flight)
+
+	async def load(in_path):
+		async with semaphore:
+			vrt_string = await _with_retries(storage.read_async, in_path, retries=retries, backoff=backoff)
+		return VrtEditor(in_path, storage=storage, vrt_string=vrt_string)
+
+	return await _gather_batch(in_paths, [load(in_path) for in_path in in_paths])
+
+
+async def write_vrts_async(vrt_editors, out_paths, storage=None, max_in_flight=32, retries=3, backoff=0.5):
+	"""
+	concurrently write VrtEditor's to out_paths (matched by position)
+	NOTE: each editor is written with its own storage backend unless storage is provided
+	NOTE: every path is tried, failures are raised together afterwards as a BatchError
+	"""
+	if len(vrt_editors) != len(out_paths):
+		raise ValueError('Number of VRT editors {} does not match number of output paths {}'.format(len(vrt_editors), len(out_paths)))
+	semaphore = asyncio.Semaphore(max_in_flight)
+
+	async def write(vrt_editor, out_path):
+		out_storage = storage if storage is not None else vrt_editor.storage
+		async with semaphore:
+			await _with_retries(out_storage.write_async, out_path, vrt_editor.to_string(), retries=retries, backoff=backoff)
+		return out_path
+
+	return await _gather_batch(out_paths, [write(vrt_editor, out_path) for vrt_editor, out_path in zip(vrt_editors, out_paths)])
+
+
+async def edit_vrts_async(in_paths, out_paths, edit_method, storage=None, out_storage=None, max_in_flight=32, retries=3, backoff=0.5, rewrite_sources=False):
+	"""
+	concurrently read, edit and write VRT's one at a time so only max_in_flight are held in memory
+	edit_method is called with each VrtEditor and modifies it in place
+	edit_method can return a dict of extra path to vrt string to write, ex: the result of prepare_overviews
+	these are written (with retries) before the edited vrt, so avoid blocking writes such as build_overviews in edit_method
+	out_storage defaults to storage, so VRT's can be copied between backends (ex: local to S3)
+	rewrite_sources calls rewrite_source_filenames before writing, so sources point at absolute (ex: /vsis3/) paths
+	NOTE: every path is tried, failures are raised together afterwards as a BatchError keyed by input path
+	"""
+	if len(in_paths) != len(out_paths):
+		raise ValueError('Number of input paths {} does not match number of output paths {}'.format(len(in_paths), len(out_paths)))
+	if storage is None:
+		storage = LocalStorage()
+	if out_storage is None:
+		out_storage = storage
+	semaphore = asyncio.Semaphore(max_in_flight)
+
+	async def edit(in_path, out_path):
+		async with semaphore:
+			vrt_string = await _with_retries(storage.read_async, in_path, retries=retries, backoff=backoff)
+			vrt_editor = VrtEditor(in_path, storage=storage, vrt_string=vrt_string)
+			extra_writes = edit_method(vrt_editor)
+			if rewrite_sources:
+				vrt_editor.rewrite_source_filenames()
+			if extra_writes is not None:
+				for extra_path, extra_string in extra_writes.items():
+					await _with_retries(out_storage.write_async, extra_path, extra_string, retries=retries, backoff=backoff)
+			await _with_retries(out_storage.write_async, out_path, vrt_editor.to_string(), retries=retries, backoff=backoff)
+		return out_path
+
+	return await _gather_batch(in_paths, [edit(in_path, out_path) for in_path, out_path in zip(in_paths, out_paths)])
+
+
+def load_vrts(in_paths, storage=None, **kwargs):
+	"""
+	blocking wrapper for load_vrts_async
+	"""
+	return asyncio.run(load_vrts_async(in_paths, storage=storage, **kwargs))
+
+
+def write_vrts(vrt_editors, out_paths, storage=None, **kwargs):
+	"""
+	blocking wrapper for write_vrts_async
+	"""
+	return asyncio.run(write_vrts_async(vrt_editors, out_paths, storage=storage, **kwargs))
+
+
+def edit_vrts(in_paths, out_paths, edit_method, storage=None, out_storage=None, **kwargs):
+	"""
+	blocking wrapper for edit_vrts_async
+	"""
+	return asyncio.run(edit_vrts_async(in_paths, out_paths, edit_method, storage=storage, out_storage=out_storage, **kwargs))
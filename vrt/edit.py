@@ -1,6 +1,11 @@
+import os
+import copy
+import math
+import posixpath
 import xmltodict
 import collections
 import numpy as np
+from vrt.storage import LocalStorage
 
 
 # list of gdal data types
@@ -9,6 +14,12 @@ gdal_data_types = ["Byte", "UInt16", "Int16", "UInt32", "Int32", "Float32", "Flo
 # mapping of gdal data types to numpy data types
 np_gdal_dict = {np.uint8: 'Byte', np.uint16: 'UInt16', np.int16: 'Int16', np.uint32: 'UInt32', np.int32: 'Int32', np.float32: 'Float32', np.float64: 'Float64'}
 
+# list of source element types that carry SrcRect/DstRect
+source_types = ['SimpleSource', 'ComplexSource']
+
+# list of gdal overview resampling methods
+ovr_resampling_types = ['nearest', 'average', 'rms', 'bilinear', 'cubic', 'cubicspline', 'lanczos', 'gauss', 'mode']
+
  
 class VrtEditor:
 	"""
@@ -21,35 +32,53 @@ class VrtEditor:
 	to create a VRT, use the gdal cli method gdalbuildvrt or the python api's gdal.BuildVRT
 	docs on build VRT's: https://gdal.org/programs/gdalbuildvrt.html
 	for info on how to use this class, checkout the README.md and the test cases
+	VRT's are read and written with LocalStorage unless another storage backend is provided (see vrt/storage.py)
+	vrt_string allows for instantiating from a VRT already in memory - in_vrt_path is then only used for reference
 	to actually create an image from the edited VRT, use gdal_translate with "--config GDAL_VRT_ENABLE_PYTHON YES", ex:
 	gdal_translate in.vrt out.tif --config GDAL_VRT_ENABLE_PYTHON YES
 	docs on gdal_translate: https://gdal.org/programs/gdal_translate.html
 	docs on the config option: https://gdal.org/drivers/raster/vrt.html#security-implications
 	"""
-	def __init__(self, in_vrt_path):
+	def __init__(self, in_vrt_path, storage=None, vrt_string=None):
 		self.in_path = in_vrt_path
-		self.vrt_dict = self._read_vrt(in_vrt_path)
+		self.storage = storage if storage is not None else LocalStorage()
+		if vrt_string is None:
+			vrt_string = self.storage.read(in_vrt_path)
+		self.vrt_dict = self._read_vrt(vrt_string)
 		self.num_bands = 0
 		self._determine_num_bands()
 		self.embed_band = None
+		# directory overview vrts were last built in, Overview filenames are relative to it
+		self.overview_dir = None
 
-	def _read_vrt(self, in_vrt_path):
+	def _read_vrt(self, vrt_string):
 		"""
-		open vrt and return ordered json dict created with xmltodict library
+		return ordered json dict of vrt string created with xmltodict library
 		"""
-		with open(in_vrt_path) as file_reader:
-			return xmltodict.parse(file_reader.read())
+		return xmltodict.parse(vrt_string)
 
-	def write_vrt(self, out_vrt_path):
+	def to_string(self):
 		"""
-		write vrt dict to .vrt file
-		NOTE: need to check that path is valid and ends in .vrt
+		return vrt dict as a vrt xml string
+		"""
+		return self._dict_to_string(self.vrt_dict)
+
+	def _dict_to_string(self, vrt_dict):
+		"""
+		return a vrt dict as a vrt xml string
 		"""
 		# remove standard xml starting line '<?xml version="1.0" encoding="utf-8"?>'
 		# NOTE: removing this is NOT necessary for it to work, but makes output standardized vrt
-		out_vrt_string = '\n'.join(xmltodict.unparse(self.vrt_dict, pretty=True).split('\n')[1:])
-		with open(out_vrt_path, 'w') as file_writer:
-			file_writer.write(out_vrt_string)
+		return '\n'.join(xmltodict.unparse(vrt_dict, pretty=True).split('\n')[1:])
+
+	def write_vrt(self, out_vrt_path, storage=None):
+		"""
+		write vrt dict to .vrt file, using the storage backend the vrt was read with unless another is provided
+		NOTE: need to check that path is valid and ends in .vrt
+		"""
+		if storage is None:
+			storage = self.storage
+		storage.write(out_vrt_path, self.to_string())
 
 	def _determine_num_bands(self):
 		"""
@@ -255,6 +284,309 @@ class VrtEditor:
 			band['@band'] = i+1
 		self.vrt_dict['VRTDataset']['VRTRasterBand'] = new_band_order
 		return
-		
 
+	### overview methods ###
+
+	def add_overview_list(self, factors, resampling=''):
+		"""
+		add an OverviewList element so gdal builds implicit overviews from the overviews of the sources
+		NOTE: requires gdal >= 3.2, factors are decimation factors, ex: [2, 4, 8]
+		docs: https://gdal.org/drivers/raster/vrt.html#vrt-descriptions-for-raster-files
+		"""
+		ovr_list = {'#text': ' '.join(str(factor) for factor in self._confirm_factors(factors))}
+		if resampling != '':
+			ovr_list['@resampling'] = self._confirm_resampling(resampling)
+		self.vrt_dict['VRTDataset']['OverviewList'] = ovr_list
+		return
+
+	def add_overview(self, ovr_path, band_num=0, source_band=None, relative_to_vrt=True):
+		"""
+		add an explicit Overview element to a band by index
+		NOTE: source_band defaults to the band number (1 for single band vrt)
+		gdal picks the overview closest to the requested resolution, so add them from largest to smallest
+		"""
+		self.embed_band = self._get_band_dict(band_num)
+		if source_band is None:
+			source_band = max(band_num, 1)
+		ovr = {
+			'SourceFilename': {'@relativeToVRT': '1' if relative_to_vrt else '0', '#text': ovr_path},
+			'SourceBand': str(source_band),
+		}
+		if 'Overview' in self.embed_band.keys():
+			ovr_list = self.embed_band['Overview']
+			if type(ovr_list) != list:
+				ovr_list = [ovr_list]
+			self.embed_band['Overview'] = ovr_list + [ovr]
+		else:
+			self.embed_band['Overview'] = ovr
+		if band_num > 0:
+			# NOTE: subtract one since gdal bands are 1-indexed
+			self.vrt_dict['VRTDataset']['VRTRasterBand'][band_num - 1] = self.embed_band
+		elif band_num == 0:
+			self.vrt_dict['VRTDataset']['VRTRasterBand'] = self.embed_band
+		return
+
+	def build_overviews(self, out_vrt_path, factors, use_source_overviews=False, scale_kwargs=None, rewrite_sources=False):
+		"""
+		write one reduced resolution vrt per factor next to out_vrt_path and reference them with Overview elements
+		output names follow the input, ex: out.vrt with factor 2 -> out_ovr2.vrt
+		by default each level keeps the full resolution SrcRect and shrinks the DstRect, so gdal decimates the read
+		use_source_overviews points each source at the matching source overview (OVERVIEW_LEVEL open option) instead
+		ASSUMPTION: source overviews are power of 2 levels, i.e. level 0 is factor 2, level 1 is factor 4
+		scale_kwargs maps pixel function argument names to a method taking (value, factor) and returning the new value
+		only arguments measured in pixels need it, ex: a window size {'window': lambda val, factor: max(1, int(val) // factor)}
+		NOTE: the GeoTransform of each level is already scaled, so functions that get pixel size from gt (ex: hillshade) need no scaling
+		overview vrts are written with the storage backend the vrt was read with
+		if out_vrt_path is in a different directory than the input vrt, relative sources of the overview vrts are
+		rewritten as absolute paths (see rewrite_source_filenames) - rewrite_sources forces this either way
+		NOTE: call this after all other edits and before write_vrt - returns the list of overview vrt paths written
+		"""
+		ovr_strings = self.prepare_overviews(out_vrt_path, factors, use_source_overviews, scale_kwargs, rewrite_sources)
+		for ovr_path, ovr_string in ovr_strings.items():
+			self.storage.write(ovr_path, ovr_string)
+		return list(ovr_strings.keys())
+
+	def prepare_overviews(self, out_vrt_path, factors, use_source_overviews=False, scale_kwargs=None, rewrite_sources=False):
+		"""
+		same as build_overviews, but return an ordered dict of overview vrt path to vrt string instead of writing them
+		useful for writing the overview vrts asynchronously (see edit_vrts in vrt/batch.py)
+		"""
+		factors = self._confirm_factors(factors)
+		if use_source_overviews:
+			for factor in factors:
+				if factor & (factor - 1) != 0:
+					raise ValueError('Factor {} does not match a power of 2 source overview level'.format(factor))
+		if scale_kwargs is None:
+			scale_kwargs = {}
+		# drop any overviews from a previous call
+		for band in self._band_list():
+			band.pop('Overview', None)
+		in_dir = posixpath.dirname(self.in_path)
+		self.overview_dir = posixpath.dirname(out_vrt_path)
+		# relative sources would break in overview vrts written somewhere else
+		if self.storage.to_gdal_path(self.overview_dir) != self.storage.to_gdal_path(in_dir):
+			rewrite_sources = True
+		out_base = os.path.splitext(out_vrt_path)[0]
+		ovr_strings = collections.OrderedDict()
+		for factor in factors:
+			ovr_path = '{}_ovr{}.vrt'.format(out_base, factor)
+			ovr_dict = self._overview_dict(factor, use_source_overviews, scale_kwargs)
+			if rewrite_sources:
+				self._rewrite_band_filenames(self._dict_band_list(ovr_dict), in_dir, in_dir)
+			ovr_strings[ovr_path] = self._dict_to_string(ovr_dict)
+		# reference overviews from largest to smallest
+		for ovr_path in ovr_strings.keys():
+			if self.num_bands == 1:
+				self.add_overview(os.path.basename(ovr_path), band_num=0)
+			else:
+				for band_num in range(1, self.num_bands + 1):
+					self.add_overview(os.path.basename(ovr_path), band_num=band_num)
+		return ovr_strings
+
+	def _overview_dict(self, factor, use_source_overviews=False, scale_kwargs=None):
+		"""
+		make a copy of the vrt dict reduced by a decimation factor
+		NOTE: overview size is rounded up, same as gdaladdo
+		"""
+		ovr_dict = copy.deepcopy(self.vrt_dict)
+		dataset = ovr_dict['VRTDataset']
+		x_size = int(dataset['@rasterXSize'])
+		y_size = int(dataset['@rasterYSize'])
+		ovr_x_size = int(math.ceil(x_size / factor))
+		ovr_y_size = int(math.ceil(y_size / factor))
+		dataset['@rasterXSize'] = str(ovr_x_size)
+		dataset['@rasterYSize'] = str(ovr_y_size)
+		x_ratio = ovr_x_size / x_size
+		y_ratio = ovr_y_size / y_size
+		if 'GeoTransform' in dataset.keys():
+			dataset['GeoTransform'] = self._scale_geotransform(dataset['GeoTransform'], x_ratio, y_ratio)
+		# overviews of overviews are not valid
+		dataset.pop('OverviewList', None)
+		bands = dataset['VRTRasterBand']
+		if type(bands) != list:
+			bands = [bands]
+		for band in bands:
+			band.pop('Overview', None)
+			for band_type in source_types:
+				if band_type not in band.keys():
+					continue
+				band_src = band[band_type]
+				if type(band_src) != list:
+					band_src = [band_src]
+				for src in band_src:
+					self._scale_source(src, factor, x_ratio, y_ratio, use_source_overviews)
+			if 'PixelFunctionArguments' in band.keys() and scale_kwargs:
+				pixel_args = band['PixelFunctionArguments']
+				for key, scale_method in scale_kwargs.items():
+					if '@' + key in pixel_args.keys():
+						pixel_args['@' + key] = str(scale_method(pixel_args['@' + key], factor))
+		return ovr_dict
+
+	def _scale_source(self, src, factor, x_ratio, y_ratio, use_source_overviews=False):
+		"""
+		scale the rects of a source dict in place for an overview level
+		NOTE: DstRect is in vrt pixel space, SrcRect is in source pixel space
+		"""
+		if 'DstRect' in src.keys():
+			src['DstRect'] = self._scale_rect(src['DstRect'], x_ratio, y_ratio)
+		if not use_source_overviews:
+			return
+		# ASSUMPTION: source overviews are power of 2 levels
+		level = int(round(math.log2(factor))) - 1
+		# source overview size is rounded up, so use exact ratios when the source size is known
+		src_x_ratio = src_y_ratio = 1 / factor
+		# NOTE: SourceProperties is dropped, the block layout of the source overview can not be derived from the
+		# full resolution one (ex: overviews are usually tiled), so gdal opens the source overview for the real values
+		if 'SourceProperties' in src.keys():
+			src_props = src.pop('SourceProperties')
+			if '@RasterXSize' in src_props.keys():
+				src_x_size = int(src_props['@RasterXSize'])
+				src_x_ratio = math.ceil(src_x_size / factor) / src_x_size
+			if '@RasterYSize' in src_props.keys():
+				src_y_size = int(src_props['@RasterYSize'])
+				src_y_ratio = math.ceil(src_y_size / factor) / src_y_size
+		if 'SrcRect' in src.keys():
+			src['SrcRect'] = self._scale_rect(src['SrcRect'], src_x_ratio, src_y_ratio)
+		open_options = src.get('OpenOptions')
+		if open_options is None:
+			open_options = {'OOI': []}
+		ooi_list = open_options.get('OOI', [])
+		if type(ooi_list) != list:
+			ooi_list = [ooi_list]
+		ooi_list = [ooi for ooi in ooi_list if ooi.get('@key') != 'OVERVIEW_LEVEL']
+		ooi_list.append({'@key': 'OVERVIEW_LEVEL', '#text': str(level)})
+		open_options['OOI'] = ooi_list if len(ooi_list) > 1 else ooi_list[0]
+		# OpenOptions must come right after SourceFilename
+		if 'OpenOptions' in src.keys():
+			src['OpenOptions'] = open_options
+		else:
+			new_src = self._update_ordered_dict(src, [{'OpenOptions': open_options}], 'SourceFilename')
+			src.clear()
+			src.update(new_src)
+		return
+
+	def _scale_rect(self, rect, x_ratio, y_ratio):
+		"""
+		scale the offsets and sizes of a SrcRect/DstRect dict
+		"""
+		new_rect = rect.copy()
+		for key, ratio in [('@xOff', x_ratio), ('@xSize', x_ratio), ('@yOff', y_ratio), ('@ySize', y_ratio)]:
+			if key in new_rect.keys():
+				new_rect[key] = self._format_num(float(new_rect[key]) * ratio)
+		return new_rect
+
+	def _scale_geotransform(self, geotransform, x_ratio, y_ratio):
+		"""
+		scale the pixel size and rotation terms of a GeoTransform string
+		"""
+		gt = [float(val) for val in geotransform.split(',')]
+		gt[1] /= x_ratio
+		gt[2] /= y_ratio
+		gt[4] /= x_ratio
+		gt[5] /= y_ratio
+		# NOTE: same formatting gdal uses when writing a vrt
+		return ','.join('{:24.16e}'.format(val) for val in gt)
+
+	def _format_num(self, num):
+		"""
+		format a number for a vrt attribute, dropping the decimal for whole numbers
+		NOTE: rounded to drop floating point noise from scaling
+		"""
+		num = round(float(num), 10)
+		if float(num).is_integer():
+			return str(int(num))
+		return repr(float(num))
+
+	def _band_list(self):
+		"""
+		get list of band dicts (single band vrt returns a list of 1)
+		"""
+		self._determine_num_bands()
+		return self._dict_band_list(self.vrt_dict)
+
+	def _dict_band_list(self, vrt_dict):
+		"""
+		get list of band dicts from a vrt dict (single band vrt returns a list of 1)
+		"""
+		bands = vrt_dict['VRTDataset']['VRTRasterBand']
+		if type(bands) != list:
+			return [bands]
+		return bands
 
+	def _confirm_factors(self, factors):
+		"""
+		confirm overview factors are integers greater than 1, returned sorted smallest to largest
+		"""
+		if len(factors) == 0:
+			raise ValueError('No overview factors provided')
+		for factor in factors:
+			if int(factor) != factor or factor < 2:
+				raise ValueError('Bad overview factor {}, must be an integer greater than 1'.format(factor))
+		return sorted(set(int(factor) for factor in factors))
+
+	def _confirm_resampling(self, resampling):
+		"""
+		confirm that overview resampling method is valid
+		"""
+		if resampling.lower() in ovr_resampling_types:
+			return resampling.lower()
+		raise ValueError('Bad overview resampling method')
+
+	### path methods ###
+
+	def rewrite_source_filenames(self, vrt_dir=None):
+		"""
+		rewrite relative source (and overview) filenames as absolute paths gdal can open from anywhere
+		relative source filenames are joined to vrt_dir, which defaults to the directory of the input vrt
+		relative overview filenames are joined to the directory build_overviews wrote them to (vrt_dir if not built)
+		the storage backend converts the result, ex: S3Storage turns s3://bucket/dir/a.tif into /vsis3/bucket/dir/a.tif
+		absolute s3:// filenames are converted to /vsis3/ paths as well
+		"""
+		if vrt_dir is None:
+			vrt_dir = posixpath.dirname(self.in_path)
+		ovr_dir = self.overview_dir if self.overview_dir is not None else vrt_dir
+		self._rewrite_band_filenames(self._band_list(), vrt_dir, ovr_dir)
+		return
+
+	def _rewrite_band_filenames(self, bands, vrt_dir, ovr_dir):
+		"""
+		rewrite the source and overview filenames of a list of band dicts in place
+		"""
+		for band in bands:
+			for band_type in source_types + ['Overview']:
+				if band_type not in band.keys():
+					continue
+				band_src = band[band_type]
+				if type(band_src) != list:
+					band_src = [band_src]
+				rel_dir = ovr_dir if band_type == 'Overview' else vrt_dir
+				for element in band_src:
+					if 'SourceFilename' in element.keys():
+						element['SourceFilename'] = self._rewrite_filename(element['SourceFilename'], rel_dir)
+		return
+
+	def _rewrite_filename(self, src_filename, vrt_dir):
+		"""
+		rewrite a single SourceFilename value (string or dict with attributes) as an absolute gdal path
+		"""
+		if type(src_filename) == str:
+			src_filename = {'#text': src_filename}
+		else:
+			src_filename = src_filename.copy()
+		filename = src_filename.get('#text', '')
+		if filename.startswith('s3://'):
+			src_filename['#text'] = '/vsis3/' + filename[len('s3://'):]
+		elif src_filename.get('@relativeToVRT') == '1':
+			src_filename['#text'] = self.storage.to_gdal_path(self._join_path(vrt_dir, filename))
+		src_filename['@relativeToVRT'] = '0'
+		return src_filename
+
+	def _join_path(self, vrt_dir, filename):
+		"""
+		join a relative filename to a directory and normalize it, ex: s3://b/swaths + ../tifs/a.tif -> s3://b/tifs/a.tif
+		NOTE: a scheme such as s3:// is kept out of the normalization, it would collapse the double slash
+		"""
+		scheme, sep, dir_path = vrt_dir.partition('://')
+		if sep == '':
+			return posixpath.normpath(posixpath.join(vrt_dir, filename))
+		return scheme + sep + posixpath.normpath(posixpath.join(dir_path, filename))
@@ -0,0 +1,183 @@
+import os
+import abc
+import asyncio
+import posixpath
+import concurrent.futures
+
+
+class StorageBackend(abc.ABC):
+	"""
+	abstract base class for where VRT's are read from and written to
+	subclasses must implement read and write, the async versions run them in a thread pool by default
+	paths are passed through as-is, it is up to the backend to interpret them
+	"""
+	def __init__(self, max_workers=None):
+		self._executor = None
+		self.max_workers = max_workers
+
+	@abc.abstractmethod
+	def read(self, path):
+		"""
+		read the file at path and return it as a string
+		NOTE: raise FileNotFoundError if it does not exist
+		"""
+
+	@abc.abstractmethod
+	def write(self, path, data):
+		"""
+		write string data to path
+		"""
+
+	def to_gdal_path(self, path):
+		"""
+		convert a path for this backend to one gdal can open
+		"""
+		return path
+
+	def _get_executor(self):
+		"""
+		lazily create the thread pool used by the async methods
+		"""
+		if self._executor is None:
+			self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers)
+		return self._executor
+
+	async def read_async(self, path):
+		"""
+		async version of read
+		"""
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self._get_executor(), self.read, path)
+
+	async def write_async(self, path, data):
+		"""
+		async version of write
+		"""
+		loop = asyncio.get_running_loop()
+		return await loop.run_in_executor(self._get_executor(), self.write, path, data)
+
+	def close(self):
+		"""
+		shutdown the thread pool, if one was created
+		"""
+		if self._executor is not None:
+			self._executor.shutdown(wait=True)
+			self._executor = None
+		return
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_val, exc_tb):
+		self.close()
+
+
+class LocalStorage(StorageBackend):
+	"""
+	read and write VRT's on the local filesystem - the default
+	"""
+	def read(self, path):
+		with open(path) as file_reader:
+			return file_reader.read()
+
+	def write(self, path, data):
+		with open(path, 'w') as file_writer:
+			file_writer.write(data)
+
+	def to_gdal_path(self, path):
+		return os.path.abspath(path)
+
+
+class MemoryStorage(StorageBackend):
+	"""
+	keep VRT's in a dict keyed by path - useful for tests
+	"""
+	def __init__(self, files=None):
+		super().__init__()
+		self.files = dict(files) if files is not None else {}
+
+	def read(self, path):
+		if path not in self.files:
+			raise FileNotFoundError(path)
+		return self.files[path]
+
+	def write(self, path, data):
+		self.files[path] = data
+
+	async def read_async(self, path):
+		return self.read(path)
+
+	async def write_async(self, path, data):
+		return self.write(path, data)
+
+
+class S3Storage(StorageBackend):
+	"""
+	read and write VRT's in an S3-compatible bucket with a single pooled boto3 client
+	paths can be s3://bucket/key, /vsis3/bucket/key, or just the key if bucket is provided
+	endpoint_url allows for S3-compatible stores such as MinIO
+	the client's connection pool and the thread pool are both sized to max_pool_connections
+	so concurrent requests reuse connections rather than opening new ones
+	NOTE: botocore retries are disabled, retries are handled once by the batch methods (see vrt/batch.py)
+	missing buckets/keys raise FileNotFoundError and denied requests raise PermissionError, so they are not retried
+	NOTE: requires boto3 - pip install boto3
+	docs on /vsis3: https://gdal.org/user/virtual_file_systems.html#vsis3-aws-s3-files
+	"""
+	def __init__(self, bucket=None, client=None, endpoint_url=None, max_pool_connections=32, **client_kwargs):
+		super().__init__(max_workers=max_pool_connections)
+		self.bucket = bucket
+		if client is None:
+			try:
+				import boto3
+				import botocore.config
+			except ImportError:
+				raise ImportError('S3Storage requires boto3, install it with: pip install boto3')
+			config = botocore.config.Config(
+				max_pool_connections=max_pool_connections,
+				retries={'total_max_attempts': 1, 'mode': 'standard'},
+			)
+			client = boto3.client('s3', endpoint_url=endpoint_url, config=config, **client_kwargs)
+		self.client = client
+
+	def _split_path(self, path):
+		"""
+		split path into bucket and key
+		"""
+		for prefix in ['s3://', '/vsis3/']:
+			if path.startswith(prefix):
+				bucket, _, key = path[len(prefix):].partition('/')
+				return bucket, key
+		if self.bucket is None:
+			raise ValueError('No bucket in path {} and no default bucket provided'.format(path))
+		return self.bucket, path.lstrip('/')
+
+	def _map_client_error(self, client_error, path):
+		"""
+		map permanent S3 errors to the builtin errors the batch methods do not retry, re-raise the rest
+		"""
+		error_code = client_error.response.get('Error', {}).get('Code', '')
+		status_code = client_error.response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+		if error_code in ['NoSuchKey', 'NoSuchBucket', 'NotFound', '404'] or status_code == 404:
+			raise FileNotFoundError(path) from client_error
+		if error_code in ['AccessDenied', 'Forbidden', '403'] or status_code in [401, 403]:
+			raise PermissionError(path) from client_error
+		raise client_error
+
+	def read(self, path):
+		bucket, key = self._split_path(path)
+		try:
+			response = self.client.get_object(Bucket=bucket, Key=key)
+		except self.client.exceptions.ClientError as client_error:
+			self._map_client_error(client_error, path)
+		return response['Body'].read().decode('utf-8')
+
+	def write(self, path, data):
+		bucket, key = self._split_path(path)
+		try:
+			self.client.put_object(Bucket=bucket, Key=key, Body=data.encode('utf-8'), ContentType='application/xml')
+		except self.client.exceptions.ClientError as client_error:
+			self._map_client_error(client_error, path)
+
+	def to_gdal_path(self, path):
+		bucket, key = self._split_path(path)
+		return posixpath.join('/vsis3', bucket, key)